@@ -1,17 +1,18 @@
 from fastapi import FastAPI, Depends, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, ORJSONResponse
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
-from sqlalchemy import text
+from sqlalchemy import text, bindparam, Integer
 from typing import List, Optional, Dict
+import numpy as np
 import pandas as pd
 import datetime
 import os
-import pytz
+from zoneinfo import ZoneInfo
 
 from database import get_db
 import models
@@ -21,7 +22,65 @@ import schemas
 # Target number of data points for graph resolution (default: 30)
 TARGET_DATA_POINTS = int(os.getenv('TARGET_DATA_POINTS', 30))
 
-app = FastAPI(title="Heartbeat Dashboard API")
+# Bucket width of the write-time rollup tables (must match the heartbeat writer)
+ROLLUP_BUCKET_SECONDS = 60
+
+# Timezone resolved once at import; zoneinfo is also faster than pytz
+LIMA_TZ = ZoneInfo("America/Lima")
+
+# orjson (C) serializes the wide history arrays far faster than stdlib json
+app = FastAPI(title="Heartbeat Dashboard API", default_response_class=ORJSONResponse)
+
+# Shared statement compilation cache. The analytics queries below bind
+# :interval as a real parameter, so every request reuses the same compiled
+# statement regardless of the selected time range.
+_COMPILED_CACHE: dict = {}
+
+# 1. Global Metrics (Grouped by Interval)
+# The MATERIALIZED CTE evaluates the range filter and the bucketing
+# expression once; the aggregates then consume the pre-filtered rowset.
+QUERY_GLOBAL = text("""
+    WITH filtered AS MATERIALIZED (
+        SELECT
+            (strftime('%s', timestamp_lima) / :interval) * :interval as bucket_ts,
+            cpu_percent, ram_percent, disk_percent,
+            cycle_duration_ms, ping_ms, timestamp_lima
+        FROM monitoring_cycles
+        WHERE timestamp_lima >= :start
+    )
+    SELECT
+        bucket_ts,
+        avg(cpu_percent) as cpu,
+        avg(ram_percent) as ram,
+        avg(disk_percent) as disk,
+        avg(cycle_duration_ms) as cycle,
+        avg(ping_ms) as ping,
+        max(timestamp_lima) as last_ts_in_bucket
+    FROM filtered
+    GROUP BY bucket_ts
+    ORDER BY bucket_ts ASC
+""").bindparams(bindparam("interval", type_=Integer))
+
+# 6. Service Metrics (Grouped)
+# Joins the materialized filtered set instead of re-filtering the full
+# monitoring_cycles table for every service row.
+QUERY_SERVICES = text("""
+    WITH filtered AS MATERIALIZED (
+        SELECT
+            id,
+            (strftime('%s', timestamp_lima) / :interval) * :interval as bucket_ts
+        FROM monitoring_cycles
+        WHERE timestamp_lima >= :start
+    )
+    SELECT
+        service_name,
+        m.bucket_ts as bucket_ts,
+        avg(latency_ms) as lat
+    FROM service_checks s
+    JOIN filtered m ON s.cycle_id = m.id
+    GROUP BY service_name, bucket_ts
+    ORDER BY bucket_ts ASC
+""").bindparams(bindparam("interval", type_=Integer))
 
 # Setup templates
 templates_dir = os.path.join(os.path.dirname(__file__), "frontend")
@@ -83,13 +142,45 @@ def smart_round(val: float) -> float:
     val = round(val, 2)
     return int(val) if val.is_integer() else val
 
+def _empty_analytics(start_ts: int, now_ts: int, interval: int):
+    """Builds the zeroed history/stats payload for a range with no rows."""
+    times = []
+    today = datetime.datetime.now(LIMA_TZ).date()
+    current_ts = start_ts
+    while current_ts <= now_ts:
+        dt = datetime.datetime.fromtimestamp(current_ts, tz=LIMA_TZ)
+        if dt.date() == today:
+            times.append(dt.strftime('%I:%M:%S %p'))
+        else:
+            times.append(dt.strftime('%Y-%m-%d %I:%M:%S %p'))
+        current_ts += interval
+
+    empty_series = [None] * len(times)
+    history_data = {
+        "times": times,
+        "system": {"cpu": empty_series, "ram": list(empty_series), "disk": list(empty_series)},
+        "cycle_duration": list(empty_series),
+        "ping": list(empty_series),
+        "services": {}
+    }
+    zero_stats = {"max": 0, "avg": 0, "min": 0, "jitter": 0}
+    stats_summary = {
+        "network_uptime": 0,
+        "network_counts": {"success": 0, "failure": 0},
+        "worker_uptime": 0,
+        "worker_dist": [],
+        "services": {},
+        "cycle_stats": dict(zero_stats),
+        "ping_stats": dict(zero_stats)
+    }
+    return history_data, stats_summary
+
 async def fetch_analytics_optimized(db: AsyncSession, range_str: str):
     """
     Fetches analytics with dynamic grouping to ensure consistent data density.
     Calculates statistics directly from the database for accuracy.
     """
-    lima_tz = pytz.timezone("America/Lima")
-    now = datetime.datetime.now(lima_tz)
+    now = datetime.datetime.now(LIMA_TZ)
     
     # Time range definitions
     deltas = {
@@ -112,42 +203,44 @@ async def fetch_analytics_optimized(db: AsyncSession, range_str: str):
     now_ts = int(now.timestamp())
     start_ts_raw = now_ts - int(delta.total_seconds())
     start_ts = (start_ts_raw // interval) * interval
-    start_time_iso = datetime.datetime.fromtimestamp(start_ts, tz=lima_tz).isoformat()
-
-    # 1. Global Metrics (Grouped by Interval)
-    query_global = text(f"""
-        SELECT 
-            (strftime('%s', timestamp_lima) / {interval}) * {interval} as bucket_ts,
-            avg(cpu_percent) as cpu,
-            avg(ram_percent) as ram,
-            avg(disk_percent) as disk,
-            avg(cycle_duration_ms) as cycle,
-            avg(ping_ms) as ping,
-            max(timestamp_lima) as last_ts_in_bucket
-        FROM monitoring_cycles
-        WHERE timestamp_lima >= :start
-        GROUP BY bucket_ts
-        ORDER BY bucket_ts ASC
-    """)
-    
-    result_global = await db.execute(query_global, {"start": start_time_iso})
-    rows_global = result_global.fetchall()
-    
-    data_map = {r.bucket_ts: r for r in rows_global}
-
-    # 2. Aggregated Stats (Uptime & Counts)
+    # Rollup buckets are aligned to ROLLUP_BUCKET_SECONDS; when the display
+    # interval is finer than that, start_ts can land mid-bucket and
+    # "bucket_ts >= start_ts" would drop the leading partial minute.
+    rollup_start_ts = start_ts - (start_ts % ROLLUP_BUCKET_SECONDS)
+    start_time_iso = datetime.datetime.fromtimestamp(start_ts, tz=LIMA_TZ).isoformat()
+
+    params = {"start": start_time_iso, "interval": interval}
+
+    # 2. Aggregated Stats (Uptime & Counts) -- runs first so an empty range
+    # short-circuits before the five remaining queries.
+    # Reads the write-time cycle_counts rollup (O(buckets) rows instead of a
+    # full scan of the cycle table); percentages are derived in Python below.
     query_stats = text("""
-        SELECT 
-            avg(internet_status) * 100 as net_up,
-            sum(case when internet_status = 1 then 1 else 0 end) as net_ok_count,
-            sum(case when internet_status = 0 then 1 else 0 end) as net_fail_count,
-            avg(case when worker_status = 200 then 1 else 0 end) * 100 as worker_up
-        FROM monitoring_cycles
-        WHERE timestamp_lima >= :start
+        SELECT
+            sum(total) as total,
+            sum(net_ok) as net_ok,
+            sum(worker_ok) as worker_ok
+        FROM cycle_counts
+        WHERE bucket_ts >= :start_ts
     """)
-    res_stats = await db.execute(query_stats, {"start": start_time_iso})
+    res_stats = await db.execute(query_stats, {"start_ts": rollup_start_ts})
     total_stats = res_stats.one()
-    
+
+    if not total_stats.total:
+        # Fresh DB or idle range: generate the empty grid directly instead of
+        # running the remaining queries and the backfill against no data.
+        return _empty_analytics(start_ts, now_ts, interval)
+
+    # 1. Global Metrics (Grouped by Interval)
+    # Streamed: rows are accumulated as the cursor produces them instead of
+    # materializing the whole rowset with fetchall() first.
+    result_global = await db.stream(
+        QUERY_GLOBAL, params, execution_options={"compiled_cache": _COMPILED_CACHE}
+    )
+    data_map = {}
+    async for r in result_global:
+        data_map[r.bucket_ts] = r
+
     # 3. Precise Global Stats (Max, Avg, Min, Jitter) from raw data
     query_global_stats = text("""
         SELECT
@@ -181,44 +274,43 @@ async def fetch_analytics_optimized(db: AsyncSession, range_str: str):
         "jitter": p_max - p_min
     }
     
-    # 4. Worker Status Distribution
+    # 4. Worker Status Distribution (from the write-time rollup)
     query_worker_dist = text("""
-        SELECT 
-            CASE 
-                WHEN worker_status IS NULL THEN 'TIMEOUT'
-                ELSE CAST(worker_status AS TEXT)
-            END as status_label,
-            count(*) as cnt
-        FROM monitoring_cycles
-        WHERE timestamp_lima >= :start
+        SELECT
+            status_label,
+            sum(cnt) as cnt
+        FROM worker_status_counts
+        WHERE bucket_ts >= :start_ts
         GROUP BY status_label
         ORDER BY cnt DESC
     """)
-    res_worker_dist = await db.execute(query_worker_dist, {"start": start_time_iso})
+    res_worker_dist = await db.execute(query_worker_dist, {"start_ts": rollup_start_ts})
     worker_dist = [{"value": r.cnt, "name": r.status_label} for r in res_worker_dist.fetchall()]
 
-    net_uptime_pct = smart_round(total_stats.net_up or 0)
-    worker_uptime_pct = smart_round(total_stats.worker_up or 0)
-    
-    net_ok = int(total_stats.net_ok_count or 0)
-    net_fail = int(total_stats.net_fail_count or 0)
+    total_cycles = int(total_stats.total or 0)
+    net_ok = int(total_stats.net_ok or 0)
+    worker_ok = int(total_stats.worker_ok or 0)
+    net_fail = total_cycles - net_ok
+
+    net_uptime_pct = smart_round(net_ok / total_cycles * 100 if total_cycles else 0)
+    worker_uptime_pct = smart_round(worker_ok / total_cycles * 100 if total_cycles else 0)
 
     # 5. Data Backfilling & Grid Generation
     times = []
     sys_cpu, sys_ram, sys_disk = [], [], []
     cycle_dur, pings = [], []
     
+    today_local = now.date()
     current_ts = start_ts
     while current_ts <= now_ts:
         row = data_map.get(current_ts)
-        
+
         # Determine appropriate time label
         if row and row.last_ts_in_bucket:
             time_label = smart_format_date(row.last_ts_in_bucket)
         else:
-            dt = datetime.datetime.fromtimestamp(current_ts, tz=lima_tz)
-            now_local = datetime.datetime.now(lima_tz)
-            if dt.date() == now_local.date():
+            dt = datetime.datetime.fromtimestamp(current_ts, tz=LIMA_TZ)
+            if dt.date() == today_local:
                 time_label = dt.strftime('%I:%M:%S %p')
             else:
                 time_label = dt.strftime('%Y-%m-%d %I:%M:%S %p')
@@ -249,109 +341,95 @@ async def fetch_analytics_optimized(db: AsyncSession, range_str: str):
     }
 
     # 6. Service Metrics (Grouped)
-    query_services = text(f"""
-        SELECT 
-            service_name,
-            (strftime('%s', m.timestamp_lima) / {interval}) * {interval} as bucket_ts,
-            avg(latency_ms) as lat
-        FROM service_checks s
-        JOIN monitoring_cycles m ON s.cycle_id = m.id
-        WHERE m.timestamp_lima >= :start
-        GROUP BY service_name, bucket_ts
-        ORDER BY bucket_ts ASC
-    """)
-    
-    result_svc = await db.execute(query_services, {"start": start_time_iso})
-    rows_svc = result_svc.fetchall()
-
-    # Organize service data
-    svc_data_map = {}
-    service_names = set()
-    for r in rows_svc:
-        service_names.add(r.service_name)
-        if r.service_name not in svc_data_map:
-            svc_data_map[r.service_name] = {}
-        # FIX: Handle NULL latency safely
-        svc_data_map[r.service_name][r.bucket_ts] = int(r.lat) if r.lat is not None else None
-
-    # Backfill service data
-    svc_series_map = {}
-    for s_name in service_names:
-        s_data = []
-        current_ts = start_ts
-        while current_ts <= now_ts:
-            val = svc_data_map.get(s_name, {}).get(current_ts)
-            s_data.append(val if val is not None else None)
-            current_ts += interval
-        svc_series_map[s_name] = s_data
-
-    history_data["services"] = svc_series_map
+    result_svc = await db.stream(
+        QUERY_SERVICES, params, execution_options={"compiled_cache": _COMPILED_CACHE}
+    )
+
+    # Fill one dense NaN-initialized row per service while streaming; a single
+    # O(rows) pass replaces the old O(services x buckets) backfill loop with
+    # its two dict probes per grid cell.
+    n_buckets = len(times)
+    svc_rows_map = {}
+    async for r in result_svc:
+        arr = svc_rows_map.get(r.service_name)
+        if arr is None:
+            arr = np.full(n_buckets, np.nan, dtype=np.float32)
+            svc_rows_map[r.service_name] = arr
+        if r.lat is not None:
+            idx = (r.bucket_ts - start_ts) // interval
+            if 0 <= idx < n_buckets:
+                arr[idx] = r.lat
+
+    history_data["services"] = {
+        name: [None if np.isnan(v) else int(v) for v in arr]
+        for name, arr in svc_rows_map.items()
+    }
 
     # 7. Service Stats (Precise Uptime & Counts)
     # Refactored to capture ALL status types for accurate distribution
     query_svc_dist = text("""
-        SELECT 
+        WITH filtered AS MATERIALIZED (
+            SELECT id FROM monitoring_cycles WHERE timestamp_lima >= :start
+        )
+        SELECT
             service_name,
             status,
             count(*) as cnt
         FROM service_checks s
-        JOIN monitoring_cycles m ON s.cycle_id = m.id
-        WHERE m.timestamp_lima >= :start
+        JOIN filtered m ON s.cycle_id = m.id
         GROUP BY service_name, status
     """)
-    result_svc_dist = await db.execute(query_svc_dist, {"start": start_time_iso})
-    rows_dist = result_svc_dist.fetchall()
-    
-    # Process distribution per service
+    result_svc_dist = await db.stream(query_svc_dist, {"start": start_time_iso})
+
+    # Process distribution per service while streaming
     svc_dist_map = {}
-    for r in rows_dist:
+    async for r in result_svc_dist:
         if r.service_name not in svc_dist_map:
             svc_dist_map[r.service_name] = {}
         svc_dist_map[r.service_name][r.status] = r.cnt
 
-    # Get Latency stats separately
-    query_svc_lat = text("""
-        SELECT 
+    # Get counts + latency stats in one pass, processed vectorized with pandas
+    # to avoid N x 4 Python-level int()/round() calls with many services.
+    query_svc_stats = text("""
+        WITH filtered AS MATERIALIZED (
+            SELECT id FROM monitoring_cycles WHERE timestamp_lima >= :start
+        )
+        SELECT
             service_name,
+            count(*) as total,
+            sum(case when status = 'healthy' then 1 else 0 end) as healthy_cnt,
             max(latency_ms) as max_lat,
             avg(latency_ms) as avg_lat,
             min(latency_ms) as min_lat
         FROM service_checks s
-        JOIN monitoring_cycles m ON s.cycle_id = m.id
-        WHERE m.timestamp_lima >= :start
+        JOIN filtered m ON s.cycle_id = m.id
         GROUP BY service_name
     """)
-    result_svc_lat = await db.execute(query_svc_lat, {"start": start_time_iso})
-    rows_lat = result_svc_lat.fetchall()
-    lat_map = {r.service_name: r for r in rows_lat}
-
-    svc_stats_dict = {}
-    for s_name in svc_dist_map:
-        dist = svc_dist_map[s_name]
-        total = sum(dist.values())
-        healthy_cnt = dist.get('healthy', 0)
-        
-        # Calculate uptime based strictly on 'healthy' status
-        uptime = (healthy_cnt / total * 100) if total > 0 else 0
-        
-        # Unhealthy count is everything that is NOT healthy
-        unhealthy_cnt = total - healthy_cnt
-        
-        lat_stats = lat_map.get(s_name)
-        s_max = int(lat_stats.max_lat or 0) if lat_stats else 0
-        s_min = int(lat_stats.min_lat or 0) if lat_stats else 0
-        s_avg = int(lat_stats.avg_lat or 0) if lat_stats else 0
-
-        svc_stats_dict[s_name] = {
-            "uptime": smart_round(uptime),
-            "success": healthy_cnt,
-            "failure": unhealthy_cnt,
-            "distribution": dist, # New field for detailed breakdown
-            "max": s_max,
-            "avg": s_avg,
-            "min": s_min,
-            "jitter": s_max - s_min
+    conn = await db.connection()
+    df = await conn.run_sync(
+        lambda sync_conn: pd.read_sql_query(query_svc_stats, sync_conn, params={"start": start_time_iso})
+    )
+
+    num_cols = ['total', 'healthy_cnt', 'max_lat', 'avg_lat', 'min_lat']
+    df[num_cols] = df[num_cols].fillna(0).astype(int)
+    df['unhealthy_cnt'] = df['total'] - df['healthy_cnt']
+    df['jitter'] = df['max_lat'] - df['min_lat']
+    # Uptime based strictly on 'healthy' status
+    df['uptime'] = (df['healthy_cnt'] / df['total'].where(df['total'] > 0, 1) * 100).round(2)
+
+    svc_stats_dict = {
+        r['service_name']: {
+            "uptime": smart_round(r['uptime']),
+            "success": r['healthy_cnt'],
+            "failure": r['unhealthy_cnt'],
+            "distribution": svc_dist_map.get(r['service_name'], {}), # Detailed breakdown
+            "max": r['max_lat'],
+            "avg": r['avg_lat'],
+            "min": r['min_lat'],
+            "jitter": r['jitter']
         }
+        for r in df.to_dict('records')
+    }
 
     stats_summary = {
         "network_uptime": net_uptime_pct,
@@ -365,7 +443,9 @@ async def fetch_analytics_optimized(db: AsyncSession, range_str: str):
 
     return history_data, stats_summary
 
-@app.get("/api/live", response_model=schemas.DashboardResponse)
+# response_model=None skips pydantic re-validation of the (already shaped)
+# dict on the hot path; the schema is kept in `responses` for the API docs.
+@app.get("/api/live", response_model=None, responses={200: {"model": schemas.DashboardResponse}})
 async def get_live_metrics(range: str = "1h", db: AsyncSession = Depends(get_db)):
     """
     Returns the most recent cycle data and historical analytics.
@@ -390,8 +470,9 @@ async def get_live_metrics(range: str = "1h", db: AsyncSession = Depends(get_db)
         history_data = {"times": [], "system": {"cpu":[], "ram":[], "disk":[]}, "cycle_duration":[], "ping":[], "services":{}}
         stats = {"network_uptime": 0, "worker_uptime": 0, "worker_dist": [], "services": {}}
 
-    # Construct the response
-    return {
+    # Construct the response. Returning ORJSONResponse directly also skips
+    # FastAPI's jsonable_encoder pass over the nested history arrays.
+    return ORJSONResponse({
         "last_updated": smart_format_date(cycle.timestamp_lima),
         "system": {
             "cpu": cycle.cpu_percent,
@@ -424,7 +505,7 @@ async def get_live_metrics(range: str = "1h", db: AsyncSession = Depends(get_db)
             } for s in cycle.service_checks
         ],
         "history": history_data
-    }
+    })
 
 def determine_service_type(url: str) -> str:
     """Determines the service type based on the URL scheme."""
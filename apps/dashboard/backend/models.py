@@ -6,7 +6,8 @@ Base = declarative_base()
 class MonitoringCycle(Base):
     __tablename__ = "monitoring_cycles"
 
-    id = Column(String, primary_key=True)
+    # Integer rowid alias: inserts append to the B-tree instead of splitting
+    id = Column(Integer, primary_key=True, autoincrement=True)
     timestamp_lima = Column(String, nullable=False, index=True)
     cpu_percent = Column(Float, nullable=False)
     ram_percent = Column(Float, nullable=False)
@@ -27,11 +28,28 @@ class MonitoringCycle(Base):
         Index('idx_cycles_ts_id', 'timestamp_lima', 'id'),
     )
 
+class WorkerStatusCount(Base):
+    """Per-minute rollup of worker status labels, maintained by the agent at write time."""
+    __tablename__ = "worker_status_counts"
+
+    bucket_ts = Column(Integer, primary_key=True)
+    status_label = Column(String, primary_key=True)
+    cnt = Column(Integer, nullable=False)
+
+class CycleCount(Base):
+    """Per-minute rollup of cycle/internet/worker counters, maintained by the agent at write time."""
+    __tablename__ = "cycle_counts"
+
+    bucket_ts = Column(Integer, primary_key=True)
+    total = Column(Integer, nullable=False)
+    net_ok = Column(Integer, nullable=False)
+    worker_ok = Column(Integer, nullable=False)
+
 class ServiceCheck(Base):
     __tablename__ = "service_checks"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    cycle_id = Column(String, ForeignKey("monitoring_cycles.id"), nullable=False, index=True)
+    cycle_id = Column(Integer, ForeignKey("monitoring_cycles.id"), nullable=False, index=True)
     service_name = Column(String, nullable=False, index=True)
     service_url = Column(String)
     status = Column(String, nullable=False)
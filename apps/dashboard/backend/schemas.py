@@ -1,13 +1,18 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import List, Optional, Dict, Any
 
+# Single authoritative schema module. Frozen + extra='ignore' lets
+# pydantic-core build its fast validation path once at import.
+class _FrozenModel(BaseModel):
+    model_config = ConfigDict(frozen=True, extra='ignore')
+
 # --- Basic Models ---
 
-class CountStats(BaseModel):
+class CountStats(_FrozenModel):
     success: int
     failure: int
 
-class ServiceStats(BaseModel):
+class ServiceStats(_FrozenModel):
     uptime: float
     success: int
     failure: int
@@ -17,7 +22,7 @@ class ServiceStats(BaseModel):
     min: float
     jitter: float
 
-class ServiceCheckSchema(BaseModel):
+class ServiceCheckSchema(_FrozenModel):
     name: str
     service_type: str
     status: str
@@ -26,11 +31,11 @@ class ServiceCheckSchema(BaseModel):
     error: Optional[str] = None # Detailed error message (e.g., "Timeout", "HTTP 500")
     stats: ServiceStats
 
-class DistributionItem(BaseModel):
+class DistributionItem(_FrozenModel):
     value: int
     name: str
 
-class MonitorStats(BaseModel):
+class MonitorStats(_FrozenModel):
     max: float
     avg: float
     min: float
@@ -38,26 +43,26 @@ class MonitorStats(BaseModel):
 
 # --- Nested Response Structures ---
 
-class SystemInfo(BaseModel):
+class SystemInfo(_FrozenModel):
     cpu: float
     ram: float
     disk: float
     containers: str
     uptime: str
 
-class MonitorInfo(BaseModel):
+class MonitorInfo(_FrozenModel):
     worker_status: Optional[int]
     uptime: Dict[str, float]
     distribution: List[DistributionItem]
     stats: MonitorStats
 
-class NetworkInfo(BaseModel):
+class NetworkInfo(_FrozenModel):
     internet_status: bool
     uptime: float
     uptime_counts: Optional[CountStats]
     stats: MonitorStats
 
-class HistoryData(BaseModel):
+class HistoryData(_FrozenModel):
     times: List[str]
     system: Dict[str, List[Optional[float]]]
     cycle_duration: List[Optional[int]]
@@ -66,7 +71,7 @@ class HistoryData(BaseModel):
 
 # --- Main API Response ---
 
-class DashboardResponse(BaseModel):
+class DashboardResponse(_FrozenModel):
     last_updated: str
     system: SystemInfo
     monitor: MonitorInfo
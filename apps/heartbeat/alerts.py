@@ -1,22 +1,37 @@
 import os
 import datetime
-import json
-import pytz
+import orjson
 import requests
 import time
+from zoneinfo import ZoneInfo
 from network import smart_request # Import smart_request from network.py
 
 # --- Constants & Environment Variables ---
 SECRET_KEY = os.getenv('SECRET_KEY')
 HEARTBEAT_URL = os.getenv('HEARTBEAT_URL')
 N8N_WEBHOOK_URL = os.getenv('N8N_WEBHOOK_URL')
-LIMA_TZ = pytz.timezone('America/Lima')
+LIMA_TZ = ZoneInfo('America/Lima')
 STATUS_CHANGE_THRESHOLD = int(os.getenv('STATUS_CHANGE_THRESHOLD', 4))
 LOOP_INTERVAL_SECONDS = int(os.getenv('LOOP_INTERVAL_SECONDS', 10))
 
+# Static header dict built once; rebuilding it every cycle is avoidable churn.
+JSON_HEADERS = {"Content-Type": "application/json"}
+
 # --- Unified State Management ---
 global_states = {}
 
+# Memoized per SECRET_KEY rather than baked in at import, so tests that
+# patch alerts.SECRET_KEY still control what gets sent.
+_heartbeat_headers_cache = (object(), None)
+
+def _heartbeat_headers():
+    global _heartbeat_headers_cache
+    key, headers = _heartbeat_headers_cache
+    if key != SECRET_KEY:
+        headers = {"Authorization": f"Bearer {SECRET_KEY}", "Content-Type": "application/json"}
+        _heartbeat_headers_cache = (SECRET_KEY, headers)
+    return headers
+
 def send_heartbeat(services_payload):
     """Sends a heartbeat with services status to the Cloudflare worker."""
     if not SECRET_KEY or not HEARTBEAT_URL:
@@ -25,9 +40,10 @@ def send_heartbeat(services_payload):
             send_heartbeat.warned = True
         return None
     
-    headers = {"Authorization": f"Bearer {SECRET_KEY}", "Content-Type": "application/json"}
     try:
-        response = smart_request('POST', HEARTBEAT_URL, {}, headers=headers, json=services_payload, timeout=6)
+        # orjson is significantly faster than the stdlib serializer requests would use
+        body = orjson.dumps(services_payload)
+        response = smart_request('POST', HEARTBEAT_URL, {}, headers=_heartbeat_headers(), data=body, timeout=6)
         return response.status_code
     except requests.exceptions.RequestException as e:
         print(f"Heartbeat request failed: {e}")
@@ -102,7 +118,7 @@ def send_notification(item_name, new_status, old_status, extra_info=None, intern
     # Retry logic
     for attempt in range(3):
         try:
-            smart_request('POST', N8N_WEBHOOK_URL, {}, json={"title": title, "message": message}, timeout=5)
+            smart_request('POST', N8N_WEBHOOK_URL, {}, headers=JSON_HEADERS, data=orjson.dumps({"title": title, "message": message}), timeout=5)
             print(f"STATE CHANGE ALERT sent for '{item_name}': {old_status or 'N/A'} -> {new_status or 'N/A'}")
             break
         except requests.exceptions.RequestException as e:
@@ -1,10 +1,16 @@
 import os
-import pytz
+import re
+import sys
+from dataclasses import dataclass, field
+from zoneinfo import ZoneInfo
+from types import MappingProxyType
+from typing import Mapping
 
 # --- Operational Configuration ---
 # Configurable via environment variables with sensible defaults.
 
-LIMA_TZ = pytz.timezone(os.getenv('TZ', 'America/Lima'))
+# zoneinfo: aware datetimes without pytz's localize/normalize allocations
+LIMA_TZ = ZoneInfo(os.getenv('TZ', 'America/Lima'))
 PING_URL = os.getenv('PING_URL', "http://www.google.com")
 
 # Main execution loop interval in seconds
@@ -23,12 +29,33 @@ N8N_WEBHOOK_URL = os.getenv('N8N_WEBHOOK_URL')
 INTERNAL_DNS_OVERRIDE_IP = os.getenv('INTERNAL_DNS_OVERRIDE_IP')
 SQLITE_DB_PATH = os.getenv('SQLITE_DB_PATH', 'data/metrics.db')
 
+@dataclass(frozen=True, slots=True)
+class ServiceSpec:
+    """
+    Immutable per-service configuration. Attribute access is C-level and the
+    read-only headers mapping never needs defensive copies on the hot path.
+    """
+    url: str
+    headers: Mapping[str, str] = field(default_factory=lambda: MappingProxyType({}))
+
+    # Dict-style access kept so callers (and tests) that pass plain
+    # {'url': ...} dicts keep working
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+# Extracts every "Key:Value" pair from a comma-separated header string in a
+# single pass, trimming surrounding whitespace as it matches.
+_HEADER_RE = re.compile(r'\s*([^,:]+?)\s*:\s*([^,]+?)\s*(?:,|$)')
+
 def parse_services_from_env():
     """
     Auto-discovers service configuration from environment variables.
     Scans for variables starting with 'SERVICE_URL_' and extracts the service name.
-    
-    Returns a dict like: {'name': {'url': '...', 'headers': {}}}.
+
+    Returns a dict like: {'name': ServiceSpec(url='...', headers={})}.
     """
     services_config = {}
     
@@ -44,15 +71,17 @@ def parse_services_from_env():
             custom_headers = {}
             headers_str = os.getenv(f'SERVICE_HEADERS_{name}')
             if headers_str:
-                try:
-                    # Expecting format "Key1:Value1,Key2:Value2"
-                    for header_pair in headers_str.split(','):
-                        k, v = header_pair.split(':', 1)
-                        custom_headers[k.strip()] = v.strip()
-                except ValueError:
+                # Expecting format "Key1:Value1,Key2:Value2"
+                pairs = _HEADER_RE.findall(headers_str)
+                # Every comma-separated segment must have matched a pair,
+                # otherwise the string is malformed (e.g. a segment without ':')
+                if len(pairs) == len(headers_str.split(',')):
+                    custom_headers = dict(pairs)
+                else:
                     print(f"Warning: Invalid format for SERVICE_HEADERS_{name}. Expected 'Key:Value,Key:Value'. Skipping custom headers for {name}.")
 
-            services_config[name] = {'url': url, 'headers': custom_headers}
+            # Interned keys make the per-cycle dict lookups on service names cheaper
+            services_config[sys.intern(name)] = ServiceSpec(url=url, headers=MappingProxyType(custom_headers))
             
     if not services_config:
         print("Warning: No services found. Set SERVICE_URL_{name} environment variables to monitor services.")
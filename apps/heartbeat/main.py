@@ -1,4 +1,8 @@
 import datetime
+import logging
+import logging.handlers
+import os
+import queue
 import time
 import json
 from concurrent.futures import ThreadPoolExecutor, as_completed
@@ -16,6 +20,25 @@ psutil.cpu_percent(interval=None)
 # Global variables
 global_states = alerts.global_states
 
+# Cycle-summary logger: writes go through a queue to a listener thread so
+# stdout write() syscalls (often piped/blocking under systemd or Docker)
+# never stall the monitoring loop itself.
+log = logging.getLogger('heartbeat')
+
+def _setup_logging():
+    """Wires the queue-backed stdout handler; returns the listener to stop."""
+    # main() can run more than once in-process (tests); don't stack handlers
+    for handler in log.handlers[:]:
+        log.removeHandler(handler)
+    log_queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter('%(message)s'))
+    listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    log.addHandler(logging.handlers.QueueHandler(log_queue))
+    log.setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
+    listener.start()
+    return listener
+
 def main(run_once=False):
     """Main monitoring loop with parallel data collection."""
     database.initialize_database()
@@ -31,54 +54,106 @@ def main(run_once=False):
     sorted_service_names = sorted(config.SERVICES_TO_CHECK.keys())
     print(f"Starting monitoring loop. Monitoring services: {sorted_service_names}")
     print(f"Config: Interval={config.LOOP_INTERVAL_SECONDS}s, Threshold={config.STATUS_CHANGE_THRESHOLD} cycles per state change.")
-    
+
+    # One persistent pool for the whole loop; spawning/joining 4 threads
+    # every cycle was pure churn.
+    executor = ThreadPoolExecutor(
+        max_workers=max(4, len(config.SERVICES_TO_CHECK) + 2),
+        thread_name_prefix="hb"
+    )
+    listener = _setup_logging()
+    try:
+        _run_loop(executor, run_once)
+    finally:
+        executor.shutdown(wait=True)
+        listener.stop()
+
+def _run_loop(executor, run_once):
+    """Executes monitoring cycles until interrupted (or once, for tests)."""
+    # Absolute-deadline scheduling: align once with the wall-clock grid, then
+    # advance a monotonic deadline per cycle. A slow work phase compresses the
+    # next sleep instead of drifting the grid.
+    interval = config.LOOP_INTERVAL_SECONDS
+    next_deadline = time.monotonic() + interval - (time.time() % interval)
+    # Disk usage barely moves between cycles; refresh the statvfs reading on
+    # a TTL and reuse it otherwise
+    disk_percent_cache = None
+    disk_cache_expiry = 0.0
     while True:
         try:
-            # --- Align with Main Loop Grid ---
-            current_time = time.time()
-            wait_seconds = config.LOOP_INTERVAL_SECONDS - (current_time % config.LOOP_INTERVAL_SECONDS)
-            time.sleep(wait_seconds)
-            
+            time.sleep(max(0, next_deadline - time.monotonic()))
+            next_deadline += interval
+            # If a cycle overran by more than a full interval, skip the
+            # missed slots rather than firing back-to-back catch-up cycles
+            now = time.monotonic()
+            while next_deadline < now:
+                next_deadline += interval
+
             cycle_start_time = time.monotonic()
             now_lima = datetime.datetime.now(config.LIMA_TZ)
             timestamp_lima = now_lima.isoformat()
-            timestamp_pretty = now_lima.strftime('%Y-%m-%d %H:%M:%S')
+            # Direct field formatting; strftime re-parses its format string
+            # on every call
+            timestamp_pretty = (
+                f"{now_lima.year:04d}-{now_lima.month:02d}-{now_lima.day:02d} "
+                f"{now_lima.hour:02d}:{now_lima.minute:02d}:{now_lima.second:02d}"
+            )
 
             # --- Collect System-Level Metrics ---
-            sys_metrics = monitors.get_system_metrics()
-            
+            if time.monotonic() >= disk_cache_expiry:
+                sys_metrics = monitors.get_system_metrics()
+                disk_percent_cache = sys_metrics['disk_percent']
+                disk_cache_expiry = time.monotonic() + monitors.DISK_USAGE_TTL_SECONDS
+            else:
+                sys_metrics = monitors.get_system_metrics(cached_disk_percent=disk_percent_cache)
+
             # --- Run I/O-Bound Checks in Parallel ---
-            with ThreadPoolExecutor(max_workers=4) as executor: 
-                future_services = {executor.submit(monitors._check_one_service, name, svc_config, config.SERVICES_TO_CHECK): name for name, svc_config in config.SERVICES_TO_CHECK.items()}
-                future_internet = executor.submit(monitors.check_internet_and_ping)
-                future_containers = executor.submit(monitors.get_container_count)
-
-                # Collect all results first
-                raw_results = []
-                for future in as_completed(future_services):
-                    name, status = future.result()
-                    raw_results.append((name, status))
-
-                # Deterministic Sorting:
-                # 1. Protocol Type (HTTP first [0], Docker second [1])
-                # 2. Service Name (Alphabetical)
-                def sort_key(item):
-                    name, _ = item
-                    url = config.SERVICES_TO_CHECK[name]['url']
-                    is_docker = 1 if url.startswith('docker:') else 0
-                    return (is_docker, name)
-
-                raw_results.sort(key=sort_key)
-
-                # Construct Ordered Dictionary
-                # Python 3.7+ preserves insertion order, so this dict will be ordered in JSON dump
-                services_health_full = {"services": {}}
-                for name, status in raw_results:
-                    services_health_full["services"][name] = status
-
-                internet_ok, ping_ms = future_internet.result()
-                container_count = future_containers.result()
-            
+            # One containers.list(all=True) snapshot serves both the count and
+            # every docker: service check, instead of K+1 socket round-trips.
+            future_docker = executor.submit(monitors.snapshot_docker_state)
+            future_services = {
+                executor.submit(monitors._check_one_service, name, svc_config, config.SERVICES_TO_CHECK): name
+                for name, svc_config in config.SERVICES_TO_CHECK.items()
+                if not svc_config['url'].startswith('docker:')
+            }
+            future_internet = executor.submit(monitors.check_internet_and_ping)
+
+            container_count, docker_by_name = future_docker.result()
+
+            # docker: checks are in-memory lookups against the snapshot
+            # (docker_by_name is None when the socket is unavailable, which
+            # falls back to the per-service client path and its error report)
+            raw_results = []
+            for name, svc_config in config.SERVICES_TO_CHECK.items():
+                if svc_config['url'].startswith('docker:'):
+                    raw_results.append(monitors._check_one_service(
+                        name, svc_config, config.SERVICES_TO_CHECK,
+                        docker_snapshot=docker_by_name
+                    ))
+
+            for future in as_completed(future_services):
+                name, status = future.result()
+                raw_results.append((name, status))
+
+            # Deterministic Sorting:
+            # 1. Protocol Type (HTTP first [0], Docker second [1])
+            # 2. Service Name (Alphabetical)
+            def sort_key(item):
+                name, _ = item
+                url = config.SERVICES_TO_CHECK[name]['url']
+                is_docker = 1 if url.startswith('docker:') else 0
+                return (is_docker, name)
+
+            raw_results.sort(key=sort_key)
+
+            # Construct Ordered Dictionary
+            # Python 3.7+ preserves insertion order, so this dict will be ordered in JSON dump
+            services_health_full = {"services": {}}
+            for name, status in raw_results:
+                services_health_full["services"][name] = status
+
+            internet_ok, ping_ms = future_internet.result()
+
             # --- Send Heartbeat to Worker ---
             worker_status = None
             if internet_ok:
@@ -112,38 +187,51 @@ def main(run_once=False):
             cycle_duration_ms = int((time.monotonic() - cycle_start_time) * 1000)
             
             # Save RAW detailed status to internal DB (e.g., 'down', 'timeout')
+            # Service rows are shaped here, already aligned with the
+            # service_checks INSERT columns, so the writer thread binds them
+            # straight into executemany without per-row dict lookups
+            service_rows = [
+                (name, data["url"], data["status"], data["status_code"],
+                 data["latency_ms"], data["error"])
+                for name, data in services_health_full.get("services", {}).items()
+            ]
             all_metrics = {
                 "timestamp_lima": timestamp_lima, **sys_metrics, "container_count": container_count,
-                "internet_ok": internet_ok, "ping_ms": ping_ms, "worker_status": worker_status, 
+                "internet_ok": internet_ok, "ping_ms": ping_ms, "worker_status": worker_status,
                 "cycle_duration_ms": cycle_duration_ms,
-                "services_health": services_health_full.get("services", {})
+                "service_rows": service_rows
             }
             database.save_metrics_to_db(all_metrics)
 
             # --- Log Cycle Summary ---
-            log_items = []
-            for name, data in services_health_full.get("services", {}).items():
-                status = data['status']
-                if status == 'healthy':
-                    latency = data.get('latency_ms', 0)
-                    log_items.append(f"{name} 🔵 ({latency}ms)")
-                else:
-                    error = data.get('error', 'Unknown')
-                    log_items.append(f"{name} 🔴 [{status.upper()}] {error}")
-            
-            services_log_str = "   |   ".join(log_items)
-            worker_log = alerts.global_states.get('worker', {})
-            transient_cnt = worker_log.get('transient_counter', 0)
-            duration_str = str(datetime.timedelta(seconds=transient_cnt * config.LOOP_INTERVAL_SECONDS))
-            
-            log_msg = (
-                f"Metrics saved at {timestamp_pretty}.\n"
-                f"  Services: {services_log_str}\n"
-                f"  Worker Status: {worker_status or 'N/A'} ({worker_log.get('last_stable_status', 'N/A')} for {duration_str} - {transient_cnt} cycles). Cycle duration: {cycle_duration_ms}ms"
-            )
-            print(log_msg)
+            # Gate the whole formatting pass: when INFO is disabled none of
+            # the per-service strings are even built
+            if log.isEnabledFor(logging.INFO):
+                log_items = []
+                for name, data in services_health_full.get("services", {}).items():
+                    status = data['status']
+                    if status == 'healthy':
+                        latency = data.get('latency_ms', 0)
+                        log_items.append(f"{name} 🔵 ({latency}ms)")
+                    else:
+                        error = data.get('error', 'Unknown')
+                        log_items.append(f"{name} 🔴 [{status.upper()}] {error}")
+
+                worker_log = alerts.global_states.get('worker', {})
+                transient_cnt = worker_log.get('transient_counter', 0)
+                duration_str = str(datetime.timedelta(seconds=transient_cnt * config.LOOP_INTERVAL_SECONDS))
+
+                log.info(
+                    "Metrics saved at %s.\n  Services: %s\n"
+                    "  Worker Status: %s (%s for %s - %s cycles). Cycle duration: %sms",
+                    timestamp_pretty, "   |   ".join(log_items),
+                    worker_status or 'N/A', worker_log.get('last_stable_status', 'N/A'),
+                    duration_str, transient_cnt, cycle_duration_ms
+                )
             
             if run_once:
+                # Make sure the background writer has committed this cycle
+                database.flush_writes()
                 break
 
         except Exception as e:
@@ -3,7 +3,9 @@ import psutil
 import docker
 import time
 import requests
+import socket
 from concurrent.futures import ThreadPoolExecutor, as_completed
+import network
 from network import smart_request # Import smart_request from network.py
 
 # --- Constants & Environment Variables (placeholders for now, will come from config) ---
@@ -12,20 +14,29 @@ SERVICE_TIMEOUT_SECONDS = int(os.getenv('SERVICE_TIMEOUT_SECONDS', 2))
 
 # Docker client setup
 _client_cache = None
+_last_ping_ts = 0.0
+
+# How long a successful ping lets the cached client be trusted without
+# re-verifying; ping() is a full HTTP round-trip over the Docker socket.
+DOCKER_PING_TTL_SECONDS = 60
 
 def get_docker_client():
     """
     Retrieves a cached Docker client or attempts to create a new one.
     Resilient to socket availability issues during startup or runtime.
+    A healthy client is trusted for DOCKER_PING_TTL_SECONDS between pings.
     Logs errors on every failure to ensure visibility.
     """
-    global _client_cache
-    
+    global _client_cache, _last_ping_ts
+
     # 1. Try to use existing client
     if _client_cache:
+        if time.monotonic() - _last_ping_ts < DOCKER_PING_TTL_SECONDS:
+            return _client_cache
         try:
-            # Simple ping to verify connection is still alive
+            # Re-verify the connection once the TTL has lapsed
             _client_cache.ping()
+            _last_ping_ts = time.monotonic()
             return _client_cache
         except Exception as e:
             print(f"ERROR: Docker client connection lost: {e}")
@@ -37,6 +48,7 @@ def get_docker_client():
         client = docker.from_env(timeout=2)
         client.ping() # Verify immediate connectivity
         _client_cache = client
+        _last_ping_ts = time.monotonic()
         print("INFO: Docker connection established/restored.")
         return _client_cache
     except Exception as e:
@@ -44,21 +56,37 @@ def get_docker_client():
         print(f"ERROR: Cannot connect to Docker socket: {e}")
         return None
 
-def get_system_metrics():
-    """Collects and rounds CPU, RAM, Disk metrics, and calculates Uptime."""
-    cpu_percent = psutil.cpu_percent(interval=None) 
+# Boot time never changes while we run; one syscall at import instead of
+# one per cycle
+_BOOT_TIME = psutil.boot_time()
+
+# How long a disk_usage (statvfs) reading stays fresh; disk fill moves far
+# slower than the loop interval, so the caller may reuse a recent value
+DISK_USAGE_TTL_SECONDS = 30
+
+def _round2(x):
+    """round(x, 2) without the banker-rounding machinery (values are >= 0)."""
+    return int(x * 100 + 0.5) / 100
+
+def get_system_metrics(cached_disk_percent=None):
+    """
+    Collects and rounds CPU, RAM, Disk metrics, and calculates Uptime.
+    cached_disk_percent lets the main loop reuse a recent statvfs reading
+    (see DISK_USAGE_TTL_SECONDS) instead of re-issuing the syscall.
+    """
+    cpu_percent = psutil.cpu_percent(interval=None)
     ram = psutil.virtual_memory()
-    disk = psutil.disk_usage('/')
-    
-    # Calculate uptime in seconds
-    uptime_seconds = time.time() - psutil.boot_time()
+    if cached_disk_percent is None:
+        disk_percent = _round2(psutil.disk_usage('/').percent)
+    else:
+        disk_percent = cached_disk_percent
 
     return {
-        "cpu_percent": round(cpu_percent, 2),
-        "ram_percent": round(ram.percent, 2),
-        "ram_used_mb": round(ram.used / (1024 * 1024), 2),
-        "disk_percent": round(disk.percent, 2),
-        "uptime_seconds": int(uptime_seconds)
+        "cpu_percent": _round2(cpu_percent),
+        "ram_percent": _round2(ram.percent),
+        "ram_used_mb": _round2(ram.used / (1024 * 1024)),
+        "disk_percent": disk_percent,
+        "uptime_seconds": int(time.time() - _BOOT_TIME)
     }
 
 def get_container_count():
@@ -72,6 +100,26 @@ def get_container_count():
         print(f"Error counting Docker containers: {e}")
         return -1
 
+def snapshot_docker_state():
+    """
+    Captures Docker state for one cycle with a single containers.list(all=True)
+    call: the running-container count plus a name -> container map, so every
+    docker: service check becomes an in-memory lookup instead of its own
+    round-trip over the Docker socket.
+
+    Returns (running_count, by_name); (-1, None) when the socket is unavailable.
+    """
+    client = get_docker_client()
+    if not client:
+        return -1, None
+    try:
+        containers = client.containers.list(all=True)
+    except Exception as e:
+        print(f"Error listing Docker containers: {e}")
+        return -1, None
+    running = sum(1 for c in containers if c.status == 'running')
+    return running, {c.name: c for c in containers}
+
 def check_internet_and_ping():
     """Checks for internet connectivity and measures latency."""
     try:
@@ -83,9 +131,11 @@ def check_internet_and_ping():
         pass
     return 0, None
 
-def _check_one_service(name, service_config, services_to_check_global):
+def _check_one_service(name, service_config, services_to_check_global, docker_snapshot=None):
     """
     Helper function to check a single service with rich status classification.
+    When docker_snapshot (a name -> container map from snapshot_docker_state)
+    is provided, docker: checks resolve from it without touching the socket.
     """
     url = service_config['url']
     headers = service_config.get('headers', {})
@@ -99,12 +149,24 @@ def _check_one_service(name, service_config, services_to_check_global):
     }
     
     if url.startswith("docker:"):
+        container_name = url.split(":", 1)[1].strip()
+
+        if docker_snapshot is not None:
+            # Resolved from this cycle's one-shot listing - no socket I/O
+            container = docker_snapshot.get(container_name)
+            if container is None:
+                result.update({"status": "down", "error": "Container not found"})
+            elif container.status == 'running':
+                result.update({"status": "healthy", "latency_ms": 0, "error": None})
+            else:
+                result.update({"status": "down", "error": f"Container state: {container.status}"})
+            return name, result
+
         client = get_docker_client()
         if not client:
             result.update({"status": "unknown", "error": "Docker Socket Unavailable"})
             return name, result
-        
-        container_name = url.split(":", 1)[1].strip()
+
         start_time = time.monotonic()
         try:
             container = client.containers.get(container_name)
@@ -124,6 +186,24 @@ def _check_one_service(name, service_config, services_to_check_global):
             result.update({"status": "unknown", "error": str(e)})
         return name, result
     else:
+        # Opt-in raw-socket probe: only for plain checks, since it bypasses
+        # custom headers and the DNS-override path
+        if network.FAST_HEAD_PROBES and not headers and not network.INTERNAL_DNS_OVERRIDE_IP:
+            try:
+                status_code, latency_ms = network.fast_head(url, SERVICE_TIMEOUT_SECONDS)
+                result["status_code"] = status_code
+                if 200 <= status_code < 400:
+                    result.update({"status": "healthy", "latency_ms": latency_ms, "error": None})
+                else:
+                    result.update({"status": "error", "error": f"HTTP {status_code}"})
+            except socket.timeout:
+                result.update({"status": "timeout", "error": "Timeout"})
+            except OSError as e:
+                result.update({"status": "down", "error": str(e)})
+            except Exception as e:
+                result.update({"status": "unknown", "error": str(e)})
+            return name, result
+
         try:
             # Pass custom headers to smart_request
             response = smart_request('HEAD', url, services_to_check_global, headers=headers, timeout=SERVICE_TIMEOUT_SECONDS)
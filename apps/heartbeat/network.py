@@ -1,7 +1,9 @@
 import os
 import requests
 import socket
-from urllib.parse import urlparse
+import ssl
+import time
+from urllib.parse import urlparse, urlsplit
 from requests.adapters import HTTPAdapter
 from urllib3.poolmanager import PoolManager
 
@@ -27,15 +29,78 @@ class IPv4Adapter(HTTPAdapter):
         return conn
 
 # --- Global Reusable Session ---
+# Single module-level session shared by every caller (monitors, alerts):
+# HTTP/1.1 keep-alive means a probe repeated each LOOP_INTERVAL_SECONDS
+# reuses its pooled connection instead of paying TCP+TLS handshakes again.
+# Pool sized so every per-cycle probe can hold a keep-alive socket without
+# blocking on urllib3's default 10-connection pool. Retries are disabled:
+# a failed probe IS the signal, and the loop retries next cycle anyway.
+_POOL_SIZE = 64
 session = requests.Session()
-session.mount('https://', IPv4Adapter())
-session.mount('http://', IPv4Adapter())
+session.mount('https://', IPv4Adapter(pool_connections=_POOL_SIZE, pool_maxsize=_POOL_SIZE, max_retries=0))
+session.mount('http://', IPv4Adapter(pool_connections=_POOL_SIZE, pool_maxsize=_POOL_SIZE, max_retries=0))
 
 # --- Environment Variables (for smart_request) ---
 # These will be loaded from config.py in the main app
 INTERNAL_DNS_OVERRIDE_IP = os.getenv('INTERNAL_DNS_OVERRIDE_IP')
 # SERVICES_TO_CHECK will be passed to smart_request or accessed via config
 
+# --- Raw-socket HEAD probe (opt-in) ---
+# Skips the requests/urllib3 stack entirely for plain health+latency probes:
+# a socket.create_connection + minimal HEAD measures true wire latency
+# instead of full request-object construction time. Opt-in because it
+# bypasses the session adapters (and therefore custom headers, the DNS
+# override path and any request-level mocking).
+FAST_HEAD_PROBES = os.getenv('FAST_HEAD_PROBES', '0') == '1'
+
+_DNS_TTL_SECONDS = int(os.getenv('LOOP_INTERVAL_SECONDS', 10))
+_dns_cache = {}  # (host, port) -> (expires_at, sockaddr)
+
+_SSL_CONTEXT = ssl.create_default_context()
+
+def _resolve_cached(host, port):
+    """Memoizes getaddrinfo per (host, port) for one loop interval."""
+    now = time.monotonic()
+    cached = _dns_cache.get((host, port))
+    if cached and cached[0] > now:
+        return cached[1]
+    sockaddr = socket.getaddrinfo(host, port, socket.AF_INET, socket.SOCK_STREAM)[0][4]
+    _dns_cache[(host, port)] = (now + _DNS_TTL_SECONDS, sockaddr)
+    return sockaddr
+
+def fast_head(url, timeout):
+    """
+    Sends a minimal HEAD over a raw socket and returns (status_code, latency_ms).
+    Raises socket.timeout / OSError on failure so callers can classify the
+    outage the same way they do for the requests path.
+    """
+    parts = urlsplit(url.strip().strip('"').strip("'"))
+    host = parts.hostname
+    is_https = parts.scheme == 'https'
+    port = parts.port or (443 if is_https else 80)
+    path = parts.path or '/'
+
+    request_bytes = (
+        f"HEAD {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n"
+    ).encode('ascii')
+
+    sockaddr = _resolve_cached(host, port)
+    start = time.monotonic()
+    sock = socket.create_connection(sockaddr, timeout=timeout)
+    try:
+        if is_https:
+            sock = _SSL_CONTEXT.wrap_socket(sock, server_hostname=host)
+        sock.sendall(request_bytes)
+        # Only the status line matters; one recv is enough for "HTTP/1.1 NNN"
+        first = sock.recv(256)
+    finally:
+        sock.close()
+    latency_ms = int((time.monotonic() - start) * 1000)
+
+    # b"HTTP/1.1 200 OK\r\n..." -> 200
+    status_code = int(first.split(b' ', 2)[1])
+    return status_code, latency_ms
+
 def smart_request(method, url, services_to_check, **kwargs):
     """
     Executes an HTTP request via the global session. 
@@ -67,8 +132,9 @@ def smart_request(method, url, services_to_check, **kwargs):
     if should_override:
         # Rewrite URL: use IP directly and force HTTP
         target_url = clean_url.replace(hostname, INTERNAL_DNS_OVERRIDE_IP, 1).replace("https://", "http://")
-        
-        # Set original Host header
+
+        # Set original Host header (copy: callers may pass read-only mappings)
+        headers = dict(headers)
         headers['Host'] = hostname
         
         # Direct IP connection settings
@@ -1,33 +1,128 @@
+import hmac
 import http.server
+from http import HTTPStatus
 import socketserver
 import json
+import queue
+import socket
 import sys
 import os
 import threading
+import time
+from collections import namedtuple
 from urllib.parse import urlparse, parse_qs
 from datetime import datetime
 
+# orjson serializes straight to bytes and decodes several times faster than
+# stdlib json; fall back so the mock stays dependency-free when it is absent.
+try:
+    import orjson
+    _json_dumps = orjson.dumps
+    _json_loads = orjson.loads
+except ImportError:
+    _json_dumps = lambda data: json.dumps(data).encode('utf-8')
+    _json_loads = json.loads
+
 # --- Config ---
 PORT = int(os.getenv('PORT', 8080))
 SECRET_KEY = os.getenv('SECRET_KEY', 'dev_secret')
 TEMPLATE_DIR = os.getenv('TEMPLATE_DIR', 'templates')
 LOG_FILE_PATH = os.getenv('LOG_FILE_PATH', '/tmp/mock_server_access.log') # Persistent log file
 
+# Built once; compared constant-time so the mock does not leak the key
+# length/prefix through timing (and skips an f-string per heartbeat)
+# Kept as bytes: compare_digest rejects non-ASCII str operands, and a
+# client can send arbitrary header bytes
+_EXPECTED_AUTH = f"Bearer {SECRET_KEY}".encode('latin-1', 'replace')
+
 # --- Simulation Configuration ---
-# Controls how the mock server behaves
-sim_config = {
-    "is_online": True,          # If False, returns 503 (Service Unavailable)
-    "mode": "AUTO",             # AUTO, RECORDED, RECOVERED, BLIND, PARTIAL, CRITICAL
-    "host_status": "online"     # Internal DB state: 'online' or 'offline' (for AUTO mode)
+# Controls how the mock server behaves. Stored as an immutable snapshot:
+# readers grab the current tuple with one atomic attribute load (no lock,
+# no dict copy), writers build a replacement under config_lock and swap
+# the pointer.
+SimConfig = namedtuple('SimConfig', 'is_online mode host_status')
+SIM_CONFIG = SimConfig(
+    is_online=True,         # If False, returns 503 (Service Unavailable)
+    mode="AUTO",            # AUTO, RECORDED, RECOVERED, BLIND, PARTIAL, CRITICAL
+    host_status="online"    # Internal DB state: 'online' or 'offline' (for AUTO mode)
+)
+config_lock = threading.Lock() # Serializes SIM_CONFIG writers
+logs_lock = threading.Lock()   # Protects the shared log handle
+
+# One buffered handle opened at import instead of open()/close() per log
+# line. Request threads only enqueue formatted lines; a dedicated writer
+# thread drains the queue and batches file + stdout writes, so log I/O
+# never runs (or blocks) on the request path.
+LOG_FH = open(LOG_FILE_PATH, 'ab', buffering=64 * 1024)
+LOG_BATCH_MAX = 256
+_log_q = queue.SimpleQueue()
+
+def _log_writer_loop():
+    while True:
+        lines = [_log_q.get()]
+        # Fold whatever accumulated into one writelines per stream
+        while len(lines) < LOG_BATCH_MAX:
+            try:
+                lines.append(_log_q.get_nowait())
+            except queue.Empty:
+                break
+        with logs_lock:
+            LOG_FH.writelines(line.encode('utf-8') for line in lines)
+            LOG_FH.flush()
+        sys.stdout.writelines(lines) # Also write to stdout for docker logs
+
+threading.Thread(target=_log_writer_loop, name='log-writer', daemon=True).start()
+
+# Long-lived read-only descriptor for /api/logs. Appends are atomic, so
+# readers pread a (size, offset) range without taking logs_lock at all;
+# the writer thread flushes after every batch, bounding any visible lag.
+# Opened after LOG_FH so the file is guaranteed to exist.
+_LOG_RFD = os.open(LOG_FILE_PATH, os.O_RDONLY)
+
+# --- Response caches ---
+# The dashboard HTML and the config JSON rarely change; serve pre-encoded
+# bytes instead of re-reading the template / re-serializing the dict on
+# every request.
+_index_cache = (None, b'')  # (mtime, encoded bytes)
+
+def _get_index_bytes():
+    """Returns the dashboard HTML bytes, re-reading only when mtime changes."""
+    global _index_cache
+    path = os.path.join(TEMPLATE_DIR, 'index.html')
+    mtime = os.stat(path).st_mtime
+    if _index_cache[0] != mtime:
+        with open(path, 'rb') as f:
+            _index_cache = (mtime, f.read())
+    return _index_cache[1]
+
+def _rebuild_config_cache():
+    """Re-encodes SIM_CONFIG; call with config_lock held after any swap."""
+    global _config_json_cache
+    _config_json_cache = _json_dumps(SIM_CONFIG._asdict())
+
+_config_json_cache = _json_dumps(SIM_CONFIG._asdict())
+
+# Forced-mode heartbeat responses are constants; encode them once at import
+# as (status code, log line, body bytes)
+_MODE_RESPONSES = {
+    "CRITICAL": (500, "🔥 [MOCK] Simulation: Forced 500 CRITICAL",
+                 _json_dumps({"error": "CRITICAL: Failed to write timestamps to D1.", "logType": "HEARTBEAT_FAILURE"})),
+    "BLIND":    (220, "⚠️ [MOCK] Simulation: Forced 220 BLIND",
+                 _json_dumps({"error": "OK, but blind. Failed to read DB status.", "logType": "HEARTBEAT_WARNING"})),
+    "PARTIAL":  (221, "⚠️ [MOCK] Simulation: Forced 221 PARTIAL",
+                 _json_dumps({"error": "OK, but update failed.", "logType": "HEARTBEAT_PARTIAL_ERROR"})),
+    "RECORDED": (200, "✅ [MOCK] Simulation: Forced 200 RECORDED",
+                 _json_dumps({"status": "recorded", "format": "with_payload", "mock": True})),
+    "RECOVERED": (200, "🎉 [MOCK] Simulation: Forced 200 RECOVERED",
+                  _json_dumps({"status": "recovered", "steps": ["Forced Recovery"], "mock": True})),
 }
-config_lock = threading.Lock() # Protects sim_config
-logs_lock = threading.Lock()   # Protects log file writes
 
 # --- Custom Request Handler ---
 class MockHeartbeatHandler(http.server.BaseHTTPRequestHandler):
-    def __init__(self, *args, **kwargs):
-        self.log_buffer = [] # Store recent logs for /api/logs endpoint
-        super().__init__(*args, **kwargs)
+    # HTTP/1.1: connections persist between requests (every response carries
+    # Content-Length), so the monitoring client reuses its TCP connection
+    # across cycles instead of re-handshaking per heartbeat
+    protocol_version = "HTTP/1.1"
 
     def log_message(self, format, *args):
         if hasattr(self, 'path') and (self.path.startswith('/api/logs') or self.path.startswith('/api/config')):
@@ -35,65 +130,68 @@ class MockHeartbeatHandler(http.server.BaseHTTPRequestHandler):
 
         message = "%s - - [%s] %s\n" % \
                   (self.client_address[0], self.log_date_time_string(), format % args)
-        
-        # Write to log file
-        with logs_lock:
-            with open(LOG_FILE_PATH, 'a') as f:
-                f.write(message)
 
-        sys.stdout.write(message) # Also write to stdout for docker logs
+        # No lock, no I/O here - the writer thread batches it out
+        _log_q.put(message)
+
+    # Route tables: dispatch is one dict lookup instead of a chain of
+    # string compares; new endpoints just add an entry
+    _GET_ROUTES = {
+        '/': 'serve_html_dashboard',
+        '/api/config': 'serve_config',
+        '/api/logs': 'serve_logs',
+        '/api/status': 'serve_config', # Legacy alias
+    }
+    _POST_ROUTES = {
+        '/api/config': 'handle_config_update',
+        '/api/heartbeat': 'handle_heartbeat',
+    }
 
     def do_GET(self):
         parsed_path = urlparse(self.path)
-        path = parsed_path.path
-
-        if path == '/':
-            self.serve_html_dashboard()
-        elif path == '/api/config':
-            self.send_json_response(200, sim_config)
-        elif path == '/api/logs':
-            self.serve_logs(parsed_path.query)
-        elif path == '/api/status': # For legacy /api/status endpoint
-             self.send_json_response(200, sim_config)
+        handler_name = self._GET_ROUTES.get(parsed_path.path)
+        if handler_name:
+            getattr(self, handler_name)(parsed_path)
         else:
             self.send_error(404)
 
     def do_POST(self):
-        parsed_path = urlparse(self.path)
-        path = parsed_path.path
-
-        if path == '/api/config':
-            self.handle_config_update()
-        elif path == '/api/heartbeat':
-            self.handle_heartbeat()
+        handler_name = self._POST_ROUTES.get(urlparse(self.path).path)
+        if handler_name:
+            getattr(self, handler_name)()
         else:
             self.send_error(404)
 
-    def serve_html_dashboard(self):
+    def serve_config(self, parsed_path):
+        self.send_json_bytes(200, _config_json_cache)
+
+    def serve_html_dashboard(self, parsed_path):
         try:
-            with open(os.path.join(TEMPLATE_DIR, 'index.html'), 'rb') as f:
-                self.send_response(200)
-                self.send_header('Content-Type', 'text/html; charset=utf-8')
-                self.end_headers()
-                self.wfile.write(f.read())
+            body = _get_index_bytes()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            # memoryview: the socket layer slices the cached page without
+            # copying it per request
+            self.wfile.write(memoryview(body))
         except FileNotFoundError:
             self.send_error(404, f"Dashboard template not found: {os.path.join(TEMPLATE_DIR, 'index.html')}")
 
-    def serve_logs(self, query_string):
-        query_params = parse_qs(query_string)
+    def serve_logs(self, parsed_path):
+        query_params = parse_qs(parsed_path.query)
         offset = int(query_params.get('offset', ['0'])[0])
         
         try:
-            with logs_lock:
-                with open(LOG_FILE_PATH, 'r') as f:
-                    f.seek(offset)
-                    logs_content = f.read()
+            # No lock: pread against the shared read-only fd; writers and
+            # readers never contend
+            size = os.fstat(_LOG_RFD).st_size
+            logs_content = os.pread(_LOG_RFD, max(0, size - offset), offset)
             self.send_response(200)
             self.send_header('Content-Type', 'text/plain; charset=utf-8')
+            self.send_header('Content-Length', str(len(logs_content)))
             self.end_headers()
-            self.wfile.write(logs_content.encode('utf-8'))
-        except FileNotFoundError:
-            self.send_error(404, "Log file not found.")
+            self.wfile.write(logs_content)
         except Exception as e:
             self.send_error(500, f"Error reading logs: {e}")
 
@@ -101,75 +199,71 @@ class MockHeartbeatHandler(http.server.BaseHTTPRequestHandler):
     def handle_config_update(self):
         content_length = int(self.headers.get('Content-Length', 0))
         post_data = self.rfile.read(content_length)
+        global SIM_CONFIG
         try:
-            new_config = json.loads(post_data)
+            new_config = _json_loads(post_data)
+            unknown = new_config.keys() - set(SimConfig._fields)
+            if unknown:
+                self.send_error(400, f"Unknown config keys: {', '.join(sorted(unknown))}")
+                return
             with config_lock:
-                sim_config.update(new_config)
-            
-            self.log_message("[MOCK] ⚙️ CONFIG UPDATED: %s", sim_config)
-            
-            self.send_json_response(200, {"status": "ok", "config": sim_config})
+                SIM_CONFIG = updated = SIM_CONFIG._replace(**new_config)
+                _rebuild_config_cache()
+
+            self.log_message("[MOCK] ⚙️ CONFIG UPDATED: %s", updated._asdict())
+
+            self.send_json_response(200, {"status": "ok", "config": updated._asdict()})
         except Exception as e:
             self.send_error(400, str(e))
 
     def handle_heartbeat(self):
-        # Read current simulation config
-        with config_lock:
-            current_config = sim_config.copy() # Make a copy to avoid holding lock during I/O
+        global SIM_CONFIG
+        # Drain the POST body up front: with keep-alive, leaving it unread on
+        # an early return would let the next request line parse mid-payload
+        content_length = int(self.headers.get('Content-Length', 0))
+        post_data = self.rfile.read(content_length)
+
+        # One atomic load gives a consistent immutable snapshot
+        current_config = SIM_CONFIG
 
         # 1. Check Availability Switch
-        if not current_config['is_online']:
+        if not current_config.is_online:
             self.log_message("❌ [MOCK] Simulation: Service Unavailable (503)")
             self.send_error(503, "Service Unavailable (Simulated)")
             return
         
         # 2. Auth Check
         auth_header = self.headers.get('Authorization')
-        expected_auth = f"Bearer {SECRET_KEY}"
-        if auth_header != expected_auth:
+        if not hmac.compare_digest((auth_header or "").encode('latin-1', 'replace'), _EXPECTED_AUTH):
             self.log_message("❌ [MOCK] Auth Failed. Got: %s", auth_header)
             self.send_error(401, "Unauthorized")
             return
 
-        # 3. Handle specific simulation modes
-        mode = current_config['mode']
-        if mode == 'CRITICAL':
-            self.log_message("🔥 [MOCK] Simulation: Forced 500 CRITICAL")
-            self.send_json_response(500, {"error": "CRITICAL: Failed to write timestamps to D1.", "logType": "HEARTBEAT_FAILURE"})
-            return
-        elif mode == 'BLIND':
-            self.log_message("⚠️ [MOCK] Simulation: Forced 220 BLIND")
-            self.send_json_response(220, {"error": "OK, but blind. Failed to read DB status.", "logType": "HEARTBEAT_WARNING"})
-            return
-        elif mode == 'PARTIAL':
-            self.log_message("⚠️ [MOCK] Simulation: Forced 221 PARTIAL")
-            self.send_json_response(221, {"error": "OK, but update failed.", "logType": "HEARTBEAT_PARTIAL_ERROR"})
-            return
-        elif mode == 'RECORDED':
-            self.log_message("✅ [MOCK] Simulation: Forced 200 RECORDED")
-            self.send_json_response(200, {"status": "recorded", "format": "with_payload", "mock": True})
-            return
-        elif mode == 'RECOVERED':
-            self.log_message("🎉 [MOCK] Simulation: Forced 200 RECOVERED")
-            self.send_json_response(200, {"status": "recovered", "steps": ["Forced Recovery"], "mock": True})
+        # 3. Handle specific simulation modes (pre-encoded canned responses)
+        canned = _MODE_RESPONSES.get(current_config.mode)
+        if canned:
+            code, log_line, body = canned
+            self.log_message(log_line)
+            self.send_json_bytes(code, body)
             return
 
         # 4. AUTO Mode (Simulate Worker Logic based on internal state)
         self.log_message("🤖 [MOCK] Auto Mode: Processing heartbeat...")
-        
-        content_length = int(self.headers.get('Content-Length', 0))
-        post_data = self.rfile.read(content_length)
-        try:
-            payload = json.loads(post_data)
-        except json.JSONDecodeError:
-            payload = {} # No payload or invalid JSON
 
-        has_payload = 'services' in payload
+        # Only the presence of the "services" key matters; a byte scan
+        # prefilters so most heartbeats skip the full JSON parse entirely
+        has_payload = False
+        if b'"services"' in post_data:
+            try:
+                has_payload = 'services' in _json_loads(post_data)
+            except ValueError: # covers both stdlib and orjson decode errors
+                pass # Invalid JSON counts as no payload
 
         response_status = "recorded"
-        with config_lock: # Need to lock to modify sim_config['host_status']
-            if sim_config['host_status'] == 'offline':
-                sim_config['host_status'] = 'online' # Recover!
+        with config_lock: # Writers still serialize the pointer swap
+            if SIM_CONFIG.host_status == 'offline':
+                SIM_CONFIG = SIM_CONFIG._replace(host_status='online') # Recover!
+                _rebuild_config_cache()
                 response_status = "recovered"
                 self.log_message("🚀 [MOCK] AUTO MODE: Host recovery triggered!")
                 # Simulate Telegram notification if needed
@@ -185,13 +279,46 @@ class MockHeartbeatHandler(http.server.BaseHTTPRequestHandler):
         })
 
     def send_json_response(self, code, data):
-        self.send_response(code)
-        self.send_header('Content-Type', 'application/json')
-        self.end_headers()
-        self.wfile.write(json.dumps(data).encode('utf-8'))
+        self.send_json_bytes(code, _json_dumps(data))
+
+    def send_json_bytes(self, code, body):
+        # The whole response goes out in one buffered write instead of the
+        # base class's separate status-line/header/body write calls
+        try:
+            phrase = HTTPStatus(code).phrase
+        except ValueError:
+            phrase = '' # Non-standard simulation codes (220/221)
+        self.log_request(code)
+        head = (
+            f"{self.protocol_version} {code} {phrase}\r\n"
+            f"Server: {self.version_string()}\r\n"
+            f"Date: {self.date_time_string()}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: keep-alive\r\n"
+            "\r\n"
+        )
+        self.wfile.write(head.encode('latin-1') + body)
+
+# Deliberately a stdlib socketserver rather than an ASGI stack: the mock's
+# job is a handful of requests per loop interval, and staying dependency-free
+# keeps it trivially runnable anywhere. Concurrency concerns are handled at
+# this layer (threaded serving, buffered logging) instead.
+class MockHeartbeatServer(socketserver.ThreadingTCPServer):
+    """Thread-per-request so one slow handler never stalls other clients."""
+    allow_reuse_address = True  # Fast restarts without TIME_WAIT bind errors
+    daemon_threads = True       # Don't block interpreter exit on handlers
+    request_queue_size = 1024   # Survive accept bursts under load testing
+
+    def server_bind(self):
+        # SO_REUSEPORT lets N mock processes share the port; the kernel
+        # load-balances accept() across them (no-op where unsupported)
+        if hasattr(socket, 'SO_REUSEPORT'):
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        super().server_bind()
 
 print(f"[MOCK] Starting Heartbeat Mock Server on port {PORT}...")
 print(f"[MOCK] Secret Key: {'[LOADED]' if SECRET_KEY else '[MISSING]'}")
 print(f"[MOCK] Dashboard available at http://localhost:{PORT}/ (if port is mapped)")
-with socketserver.TCPServer(('', PORT), MockHeartbeatHandler) as httpd:
+with MockHeartbeatServer(('', PORT), MockHeartbeatHandler) as httpd:
     httpd.serve_forever()
\ No newline at end of file
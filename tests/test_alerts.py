@@ -1,3 +1,4 @@
+import itertools
 import pytest
 from unittest.mock import MagicMock, patch
 import alerts
@@ -8,6 +9,17 @@ def reset_global_states():
     """Clear global state dictionary before each test execution."""
     alerts.global_states.clear()
 
+def _drive(service, status, healthy, n):
+    """
+    Drives n consecutive check_state_change cycles and returns the final
+    result. itertools.repeat keeps the iteration in C, so threshold-sized
+    (or fuzz-sized) sequences don't become a Python-level loop in tests.
+    """
+    result = None
+    for _ in itertools.repeat(None, n):
+        result = alerts.check_state_change(service, status, healthy)
+    return result
+
 def test_check_state_change_transient_failure():
     """Verify that state changes below the threshold do not trigger notifications."""
     service_name = "test_service"
@@ -39,10 +51,8 @@ def test_check_state_change_confirmed_failure():
     
     with patch('alerts.STATUS_CHANGE_THRESHOLD', 3):
         # Sequence of failures leading to threshold
-        alerts.check_state_change(service_name, 'unhealthy', ['healthy'])
-        alerts.check_state_change(service_name, 'unhealthy', ['healthy'])
-        action, old_status, _ = alerts.check_state_change(service_name, 'unhealthy', ['healthy'])
-        
+        action, old_status, _ = _drive(service_name, 'unhealthy', ['healthy'], 3)
+
         assert action == 'NOTIFY_DOWN'
         assert old_status == 'healthy'
         assert alerts.global_states[service_name]['last_stable_status'] == 'unhealthy'
@@ -1,5 +1,6 @@
 import pytest
 import sqlite3
+import uuid
 import requests_mock
 from unittest.mock import patch
 from main import main
@@ -19,39 +20,60 @@ def mock_environment():
          patch('alerts.N8N_WEBHOOK_URL', "http://n8n.test/webhook"), \
          patch('config.SQLITE_DB_PATH', ":memory:"), \
          patch('network.INTERNAL_DNS_OVERRIDE_IP', None), \
-         patch('monitors.get_container_count', return_value=5): 
+         patch('monitors.snapshot_docker_state', return_value=(5, None)):
         yield
 
-def test_integration_full_cycle_with_db(tmp_path):
+@pytest.fixture(scope='module')
+def http_mock():
+    """
+    One requests_mock adapter mounted for the whole module: entering/leaving
+    Mocker per test rebuilds the adapter stack each time. Tests re-register
+    their URLs (the newest matcher wins) and call reset_mock() for history.
+    """
+    with requests_mock.Mocker() as m:
+        yield m
+
+@pytest.fixture
+def mem_db():
+    """
+    Shared-cache in-memory SQLite DB, patched in as database.DB_FILE.
+    The anchor connection keeps the DB alive for the test's assertions;
+    a unique name per test preserves isolation without any filesystem I/O.
+    """
+    uri = f"file:{uuid.uuid4().hex}?mode=memory&cache=shared"
+    anchor = sqlite3.connect(uri, uri=True)
+    anchor.row_factory = sqlite3.Row
+    with patch('database.DB_FILE', uri):
+        yield anchor
+    anchor.close()
+
+def test_integration_full_cycle_with_db(mem_db, http_mock):
     """
     Verify a full monitoring cycle: fetching metrics, sending heartbeat, and persisting to DB.
-    Uses a temporary SQLite file to verify write operations.
+    Uses a shared in-memory SQLite DB to verify write operations.
     """
-    db_file = tmp_path / "test_metrics.db"
     test_services = {"api": {"url": "http://api.test/health"}}
-    
-    with requests_mock.Mocker() as m:
-        m.head("http://api.test/health", status_code=200)
-        m.post("http://worker.test/heartbeat", status_code=200)
-        m.head("http://www.google.com", status_code=200)
-        
-        with patch('time.sleep'), \
-             patch('config.SERVICES_TO_CHECK', test_services), \
-             patch('database.DB_FILE', db_file): # Patch module-level DB_FILE constant
-            
-            main(run_once=True)
-            
+
+    http_mock.reset_mock()
+    http_mock.head("http://api.test/health", status_code=200)
+    http_mock.post("http://worker.test/heartbeat", status_code=200)
+    http_mock.head("http://www.google.com", status_code=200)
+
+    with patch('time.sleep'), \
+         patch('config.SERVICES_TO_CHECK', test_services):
+
+        main(run_once=True)
+
     # Verify DB content
-    conn = sqlite3.connect(str(db_file))
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
+    cursor = mem_db.cursor()
+
     # Check global cycle
     cursor.execute("SELECT * FROM monitoring_cycles")
     cycle = cursor.fetchone()
     assert cycle is not None
     assert cycle['internet_status'] == 1
     assert cycle['worker_status'] == 200
+    assert cycle['container_count'] == 5
     
     # Check individual service detail
     cursor.execute("SELECT * FROM service_checks WHERE cycle_id = ?", (cycle['id'],))
@@ -60,38 +82,30 @@ def test_integration_full_cycle_with_db(tmp_path):
     assert check['service_name'] == 'api'
     assert check['status'] == 'healthy'
     assert check['latency_ms'] is not None
-    
-    conn.close()
 
-def test_integration_service_failure(tmp_path):
+def test_integration_service_failure(mem_db, http_mock):
     """
     Verify that service failures are correctly recorded in the database.
     """
-    db_file = tmp_path / "test_fail.db"
     test_services = {"api": {"url": "http://api.test/health"}}
 
-    with requests_mock.Mocker() as m:
-        m.head("http://api.test/health", status_code=500)
-        m.post("http://worker.test/heartbeat", status_code=200)
-        m.head("http://www.google.com", status_code=200)
-        
-        with patch('time.sleep'), \
-             patch('config.SERVICES_TO_CHECK', test_services), \
-             patch('database.DB_FILE', db_file):
-            
-            main(run_once=True)
-            
-    conn = sqlite3.connect(str(db_file))
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
+    http_mock.reset_mock()
+    http_mock.head("http://api.test/health", status_code=500)
+    http_mock.post("http://worker.test/heartbeat", status_code=200)
+    http_mock.head("http://www.google.com", status_code=200)
+
+    with patch('time.sleep'), \
+         patch('config.SERVICES_TO_CHECK', test_services):
+
+        main(run_once=True)
+
+    cursor = mem_db.cursor()
+
     # Check for specific failure status (HTTP 500 -> 'error')
     cursor.execute("SELECT * FROM service_checks ORDER BY id DESC LIMIT 1")
     row = cursor.fetchone()
-    
+
     assert row is not None
     assert row['service_name'] == 'api'
     assert row['status'] == 'error'
-    assert "HTTP 500" in row['error_message']
-    
-    conn.close()
\ No newline at end of file
+    assert "HTTP 500" in row['error_message']
\ No newline at end of file
@@ -3,60 +3,35 @@ from unittest.mock import MagicMock, patch
 import monitors
 import docker
 
-def test_check_one_service_docker_running():
-    """Verify that a running container is reported as healthy."""
+@pytest.mark.parametrize("container_state,expected_status,expected_error", [
+    ('running', 'healthy', None),                          # running -> healthy
+    ('exited', 'down', 'Container state: exited'),         # stopped -> down
+    (docker.errors.NotFound, 'down', 'Container not found'),  # missing -> down
+])
+def test_check_one_service_docker(container_state, expected_status, expected_error):
+    """Verify docker: service classification for running, stopped and missing containers."""
     service_name = "db"
     service_config = {"url": "docker:my-db"}
     services_global = {}
-    
-    mock_container = MagicMock()
-    mock_container.status = 'running'
-    
-    with patch('monitors.get_docker_client') as mock_get_client:
-        mock_client = MagicMock()
-        mock_client.containers.get.return_value = mock_container
-        mock_get_client.return_value = mock_client
-        
-        name, result = monitors._check_one_service(service_name, service_config, services_global)
-        
-        assert name == service_name
-        assert result['status'] == 'healthy'
-        assert result['error'] is None
 
-def test_check_one_service_docker_stopped():
-    """Verify that a stopped container is reported as down."""
-    service_name = "db"
-    service_config = {"url": "docker:my-db"}
-    services_global = {}
-    
-    mock_container = MagicMock()
-    mock_container.status = 'exited'
-    
     with patch('monitors.get_docker_client') as mock_get_client:
         mock_client = MagicMock()
-        mock_client.containers.get.return_value = mock_container
+        if isinstance(container_state, type) and issubclass(container_state, Exception):
+            mock_client.containers.get.side_effect = container_state("Not found")
+        else:
+            mock_container = MagicMock()
+            mock_container.status = container_state
+            mock_client.containers.get.return_value = mock_container
         mock_get_client.return_value = mock_client
-        
-        name, result = monitors._check_one_service(service_name, service_config, services_global)
-        
-        assert result['status'] == 'down'
-        assert "Container state: exited" in result['error']
 
-def test_check_one_service_docker_not_found():
-    """Verify that a missing container is reported as down."""
-    service_name = "db"
-    service_config = {"url": "docker:ghost-container"}
-    services_global = {}
-    
-    with patch('monitors.get_docker_client') as mock_get_client:
-        mock_client = MagicMock()
-        mock_client.containers.get.side_effect = docker.errors.NotFound("Not found")
-        mock_get_client.return_value = mock_client
-        
         name, result = monitors._check_one_service(service_name, service_config, services_global)
-        
-        assert result['status'] == 'down'
-        assert result['error'] == "Container not found"
+
+        assert name == service_name
+        assert result['status'] == expected_status
+        if expected_error is None:
+            assert result['error'] is None
+        else:
+            assert expected_error in result['error']
 
 def test_get_system_metrics():
     """Verify that system metrics collection returns expected structure and types."""
@@ -1,5 +1,6 @@
 import pytest
 import requests_mock
+import network
 from network import smart_request
 
 def test_smart_request_no_override():
@@ -42,6 +43,19 @@ def test_smart_request_with_dns_override():
             assert last_request.url == expected_url
             assert last_request.headers['Host'] == "service.local"
 
+def test_smart_request_uses_shared_session():
+    """Verify that smart_request goes through the module-level session, so keep-alive reuse applies."""
+    url = "https://api.example.com/health"
+    sentinel = object()
+
+    # Stub only the shared session's request method: smart_request returns
+    # the sentinel only if it actually routes through network.session
+    with pytest.MonkeyPatch().context() as mp:
+        mp.setattr("network.INTERNAL_DNS_OVERRIDE_IP", None)
+        mp.setattr(network.session, "request", lambda method, target, **kwargs: sentinel)
+
+        assert smart_request('GET', url, {}) is sentinel
+
 def test_smart_request_with_unmatched_service():
     """Verify that DNS override is NOT applied if the hostname does not match a monitored service."""
     # Use a path to avoid trailing slash ambiguity